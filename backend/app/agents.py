@@ -4,10 +4,9 @@
 class DecisionAgent:
     def __init__(self, name="Decision-Agent"):
         self.name = name
-        self.history = []  # List of {action, status, timestamp, incident_id}
+        self.history = deque(maxlen=10)  # Last 10 {action, status, timestamp, incident_id}
 
     def handle_envelope(self, envelope, session=None):
-        import datetime
         # Accepts MessageEnvelope, expects 'action' and 'incident_id' in content
         content = envelope.content
         action = content.get("action")
@@ -22,7 +21,6 @@ class DecisionAgent:
             "timestamp": datetime.datetime.now().isoformat()
         }
         self.history.append(entry)
-        self.history = self.history[-10:]
         content["decision_status"] = status
         content["decision_message"] = message
         envelope.add_trace(self.name, entry)
@@ -31,7 +29,6 @@ class DecisionAgent:
 
     def handle_decision(self, action, incident_id=None):
         # For legacy direct calls
-        import datetime
         status = "success" if action in ["SEND", "HOLD"] else "error"
         message = f"Action {action} processed" if status == "success" else f"Unknown action: {action}"
         entry = {
@@ -42,11 +39,10 @@ class DecisionAgent:
             "timestamp": datetime.datetime.now().isoformat()
         }
         self.history.append(entry)
-        self.history = self.history[-10:]
         return entry
 
     def get_history(self):
-        return self.history
+        return list(self.history)
 
 def get_decision_agent():
     # Singleton pattern for global state
@@ -61,46 +57,291 @@ Defines agent classes, reasoning, and orchestration.
 
 
 # Agentic pipeline concepts: session, memory, observability, evaluation, multi-agent orchestration
+import asyncio
+import datetime
+import hashlib
+import importlib.util
 import os
+import sqlite3
+import threading
 import time
 import uuid
-from typing import List, Dict, Any
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Mapping, Tuple
+import httpx
+import orjson
 from loguru import logger
 import google.generativeai as genai
 
 from app.relief_tools import (
+    Incident,
     format_display_alert,
     get_available_units,
     notify_dispatch,
     plan_relief_response,
 )
 
-# --- Gemini API Setup ---
+# --- LLM Provider Setup ---
 GOOGLE_API_KEY = os.getenv("API_KEY")
 if GOOGLE_API_KEY:
     genai.configure(api_key=GOOGLE_API_KEY)
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+_MODEL_CACHE: Dict[str, "genai.GenerativeModel"] = {}
 
-USE_GEMINI = os.getenv("USE_GEMINI", "true").strip().lower() not in {"0", "false", "no", "off"}
-GEMINI_BACKOFF_SECONDS = int(os.getenv("GEMINI_BACKOFF_SECONDS", "45"))
-_gemini_backoff_until = 0.0
+_FALSEY = frozenset({"0", "false", "no", "off", ""})
+# USE_GEMINI predates the other providers; it still switches every LLM call off.
+USE_GEMINI = os.environ.get("USE_GEMINI", "true").strip().lower() not in _FALSEY
+LLM_ERROR_PREFIX = "[LLM"
 
+# Quota errors back off a provider for base * 2^(n-1) seconds (capped), where n
+# counts its consecutive 429s; the streak only resets after a successful call.
+LLM_BACKOFF_SECONDS = int(os.getenv("LLM_BACKOFF_SECONDS", os.getenv("GEMINI_BACKOFF_SECONDS", "30")))
+LLM_BACKOFF_MAX_SECONDS = int(os.getenv("LLM_BACKOFF_MAX_SECONDS", os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "600")))
+_backoff_until: Dict[str, float] = {}
+_consecutive_429: Dict[str, int] = {}
+_backoff_lock = threading.Lock()
 
-def _gemini_available() -> bool:
-    return bool(GOOGLE_API_KEY) and USE_GEMINI and time.time() >= _gemini_backoff_until
+# An unparseable (but successful) response is retried once with a corrective
+# prompt; requests are greedy-decoded, so re-sending the same prompt would only
+# reproduce the same reply. Quota errors and truncated replies are not retried.
+LLM_PARSE_ATTEMPTS = 2
+LLM_JSON_RETRY_SUFFIX = "\n\nYour previous reply was not a valid JSON object. Reply with only the JSON object."
 
+# Gemini 2.5 models think before answering and count those tokens against
+# max_output_tokens. This SDK cannot set a thinking budget, so their cap is widened.
+GEMINI_THINKING_TOKENS = int(os.getenv("GEMINI_THINKING_TOKENS", "4096"))
 
-def _trip_gemini_backoff(error_message: str) -> None:
-    global _gemini_backoff_until
+
+class LLMTruncatedError(RuntimeError):
+    """The model stopped at max_output_tokens; retrying the same request cannot help."""
+
+# Free-tier Gemini allows ~15 requests/minute; calls are paced client-side rather
+# than waiting for a 429. A call that would queue longer than LLM_RATE_MAX_WAIT
+# seconds skips the provider instead.
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "15"))
+LLM_RATE_MAX_WAIT = float(os.getenv("LLM_RATE_MAX_WAIT", "2"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket holding `capacity` tokens, refilled at `rate` tokens per second."""
+
+    def __init__(self, capacity: int, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: float = 0.0) -> bool:
+        """Take one token, sleeping up to `max_wait` seconds for it; False if it would take longer."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            wait = (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                return False
+            # Reserve the token now so concurrent callers queue behind this one.
+            self._tokens -= 1
+        time.sleep(wait)
+        return True
+
+
+class Provider(ABC):
+    """One LLM vendor SDK behind a common `generate(prompt, model)` call.
+
+    `generation_config` uses Gemini's key names (`temperature`, `max_output_tokens`,
+    `response_mime_type`); other providers map the keys they support.
+    """
+    name = ""
+    sdk = ""
+
+    def __init__(self, api_key=None, rate_limit: TokenBucket = None):
+        self.api_key = api_key
+        self.rate_limit = rate_limit
+        # Resolved once: availability is checked on every call, and a missing SDK
+        # would otherwise mean a sys.path search each time.
+        self._sdk_installed = importlib.util.find_spec(self.sdk) is not None
+
+    def available(self) -> bool:
+        return bool(self.api_key) and self._sdk_installed
+
+    @abstractmethod
+    def generate(self, prompt: str, model: str, generation_config: Mapping[str, Any] = None) -> str:
+        """Return the model's text reply to `prompt`."""
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+    sdk = "google.generativeai"
+
+    def generate(self, prompt: str, model: str, generation_config: Mapping[str, Any] = None) -> str:
+        # genai is configured once at import; model handles are built once per name.
+        gemini_model = _MODEL_CACHE.get(model)
+        if gemini_model is None:
+            gemini_model = _MODEL_CACHE.setdefault(model, genai.GenerativeModel(model))
+        if generation_config:
+            config = dict(generation_config)
+            if "max_output_tokens" in config and "gemini-2.5" in model:
+                config["max_output_tokens"] += GEMINI_THINKING_TOKENS
+            response = gemini_model.generate_content(prompt, generation_config=config)
+        else:
+            response = gemini_model.generate_content(prompt)
+        candidates = getattr(response, "candidates", None) or []
+        if candidates:
+            reason = candidates[0].finish_reason
+            if getattr(reason, "name", reason) == "MAX_TOKENS":
+                raise LLMTruncatedError(f"{model} reply truncated at max_output_tokens (MAX_TOKENS)")
+        try:
+            # .text raises ValueError when the candidate has no parts.
+            text = response.text
+        except (AttributeError, ValueError):
+            text = None
+        if not text and candidates and candidates[0].content.parts:
+            text = "".join(part.text for part in candidates[0].content.parts if hasattr(part, "text"))
+        return text or ""
+
+
+# Anthropic and OpenAI calls share one keep-alive connection pool instead of each SDK
+# client opening its own; Gemini already reuses its cached model handles.
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def _shared_http_client() -> httpx.Client:
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+        return _http_client
+
+
+class AnthropicProvider(Provider):
+    name = "anthropic"
+    sdk = "anthropic"
+    max_tokens = 1024
+
+    def __init__(self, api_key=None):
+        super().__init__(api_key)
+        self._client = None
+
+    def generate(self, prompt: str, model: str, generation_config: Mapping[str, Any] = None) -> str:
+        if self._client is None:
+            import anthropic
+            self._client = anthropic.Anthropic(api_key=self.api_key, http_client=_shared_http_client())
+        config = generation_config or {}
+        options = {"temperature": config["temperature"]} if "temperature" in config else {}
+        message = self._client.messages.create(
+            model=model,
+            max_tokens=config.get("max_output_tokens", self.max_tokens),
+            messages=[{"role": "user", "content": prompt}],
+            **options,
+        )
+        if message.stop_reason == "max_tokens":
+            raise LLMTruncatedError(f"{model} reply truncated at max_tokens")
+        return "".join(block.text for block in message.content if getattr(block, "type", "") == "text")
+
+
+class OpenAIProvider(Provider):
+    name = "openai"
+    sdk = "openai"
+
+    def __init__(self, api_key=None):
+        super().__init__(api_key)
+        self._client = None
+
+    def generate(self, prompt: str, model: str, generation_config: Mapping[str, Any] = None) -> str:
+        if self._client is None:
+            import openai
+            self._client = openai.OpenAI(api_key=self.api_key, http_client=_shared_http_client())
+        config = generation_config or {}
+        options = {}
+        if "temperature" in config:
+            options["temperature"] = config["temperature"]
+        if "max_output_tokens" in config:
+            options["max_tokens"] = config["max_output_tokens"]
+        if config.get("response_mime_type") == "application/json":
+            options["response_format"] = {"type": "json_object"}
+        response = self._client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **options,
+        )
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            raise LLMTruncatedError(f"{model} reply truncated at max_tokens")
+        return choice.message.content or ""
+
+
+PROVIDERS: Dict[str, Provider] = {
+    provider.name: provider
+    for provider in (
+        GeminiProvider(GOOGLE_API_KEY, TokenBucket(GEMINI_RPM, GEMINI_RPM / 60) if GEMINI_RPM > 0 else None),
+        AnthropicProvider(ANTHROPIC_API_KEY),
+        OpenAIProvider(OPENAI_API_KEY),
+    )
+}
+
+
+def _provider_available(provider: str) -> bool:
+    return USE_GEMINI and PROVIDERS[provider].available() and time.time() >= _backoff_until.get(provider, 0.0)
+
+
+def _llm_available(model_chain: List[Tuple[str, str]]) -> bool:
+    return any(_provider_available(provider) for provider, _ in model_chain)
+
+
+def _is_quota_error(error_message: str) -> bool:
     lower_msg = (error_message or "").lower()
-    if "429" in lower_msg or "quota" in lower_msg or "rate limit" in lower_msg:
-        _gemini_backoff_until = time.time() + GEMINI_BACKOFF_SECONDS
-        logger.warning(f"Gemini backoff engaged for {GEMINI_BACKOFF_SECONDS}s due to error: {error_message}")
+    return "429" in lower_msg or "quota" in lower_msg or "rate limit" in lower_msg
+
+
+def _is_llm_error(text: str) -> bool:
+    return text.startswith(LLM_ERROR_PREFIX)
+
+
+def _trip_backoff(provider: str, error_message: str) -> None:
+    if not _is_quota_error(error_message):
+        return
+    with _backoff_lock:
+        if time.time() < _backoff_until.get(provider, 0.0):
+            # Another model in the chain (or a concurrent call) already tripped this window.
+            return
+        streak = _consecutive_429.get(provider, 0) + 1
+        _consecutive_429[provider] = streak
+        delay = min(LLM_BACKOFF_SECONDS * 2 ** (streak - 1), LLM_BACKOFF_MAX_SECONDS)
+        _backoff_until[provider] = time.time() + delay
+    logger.warning(f"{provider} backoff engaged for {delay}s (429 streak {streak}) due to error: {error_message}")
+
 
+def _reset_backoff(provider: str) -> None:
+    if _consecutive_429.get(provider):
+        with _backoff_lock:
+            _consecutive_429[provider] = 0
 
-def _parse_model_chain(value: str, default: List[str]) -> List[str]:
-    if value:
-        return [model.strip() for model in value.split(",") if model.strip()]
-    return default
+
+def _parse_model_chain(value: str, default: List[str]) -> List[Tuple[str, str]]:
+    # Entries are "provider:model"; bare names (e.g. "models/gemini-2.5-flash") default to Gemini.
+    entries = [model.strip() for model in value.split(",") if model.strip()] if value else default
+    chain = []
+    for entry in entries:
+        provider, sep, model = entry.partition(":")
+        if not sep:
+            provider, model = "gemini", entry
+        provider = provider.strip().lower()
+        if provider not in PROVIDERS:
+            logger.warning(f"Ignoring model '{entry}': unknown LLM provider '{provider}'")
+            continue
+        chain.append((provider, model.strip()))
+    return chain
 
 
 DISPATCH_MODEL_CHAIN = _parse_model_chain(
@@ -116,41 +357,399 @@ SUMMARY_MODEL_CHAIN = _parse_model_chain(
     ["models/gemini-2.5-flash", "models/gemini-1.5-flash", "models/gemini-lite"],
 )
 
+# Plans are short JSON objects: decode greedily and cap the output length. The caps
+# size the answer itself; GeminiProvider adds GEMINI_THINKING_TOKENS for 2.5 models.
+DISPATCH_GENERATION_CONFIG = {"temperature": 0, "max_output_tokens": 256, "response_mime_type": "application/json"}
+RESOURCE_GENERATION_CONFIG = {"temperature": 0, "max_output_tokens": 512, "response_mime_type": "application/json"}
+
 
-def _run_gemini(prompt: str, model_chain: List[str]) -> str:
-    if not _gemini_available():
-        return "[Gemini disabled]"
+def _run_llm(prompt: str, model_chain: List[Tuple[str, str]], generation_config: Mapping[str, Any] = None) -> str:
+    if not _llm_available(model_chain):
+        return "[LLM disabled]"
     last_error = ""
-    for model_name in model_chain:
+    for provider, model_name in model_chain:
+        if not _provider_available(provider):
+            continue
+        rate_limit = PROVIDERS[provider].rate_limit
+        if rate_limit is not None and not rate_limit.acquire(LLM_RATE_MAX_WAIT):
+            logger.warning(f"{provider} rate cap reached; skipping {model_name}")
+            last_error = last_error or "rate-capped"
+            continue
         try:
-            genai.configure(api_key=GOOGLE_API_KEY)
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
-            text = getattr(response, "text", None)
-            if not text and hasattr(response, "candidates"):
-                candidates = response.candidates or []
-                if candidates and candidates[0].content.parts:
-                    text = "".join(part.text for part in candidates[0].content.parts if hasattr(part, "text"))
-            if not text:
-                text = ""
+            text = PROVIDERS[provider].generate(prompt, model_name, generation_config)
+            _reset_backoff(provider)
             return text.strip()
         except Exception as e:
             last_error = str(e)
-            logger.error(f"Gemini API error ({model_name}): {e}")
-            _trip_gemini_backoff(last_error)
-    return f"[Gemini error: {last_error or 'unavailable'}]"
+            logger.error(f"{provider} API error ({model_name}): {e}")
+            _trip_backoff(provider, last_error)
+    if last_error == "rate-capped":
+        return "[LLM rate-capped]"
+    return f"[LLM error: {last_error or 'unavailable'}]"
+
+
+async def _run_llm_async(prompt: str, model_chain: List[Tuple[str, str]], generation_config: Mapping[str, Any] = None) -> str:
+    # The SDK calls block, so run them off the event loop to let agents overlap.
+    return await asyncio.to_thread(_run_llm, prompt, model_chain, generation_config)
+
+
+# --- LLM Response Parsing ---
+def _strip_code_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rstrip()
+        if text.endswith("```"):
+            text = text[:-3]
+    return text.strip()
+
+
+def _parse_json_object(text: str):
+    try:
+        result = orjson.loads(_strip_code_fence(text))
+    except ValueError:
+        return None
+    return result if isinstance(result, dict) else None
+
+
+def _json_attempt(prompt: str, response: str, attempt: int):
+    """
+    Judge `response`, the reply to attempt number `attempt` at `prompt`.
+    Returns (parsed_or_None, next_request); next_request is None when there is nothing to retry.
+    """
+    if _is_llm_error(response):
+        return None, None
+    result = _parse_json_object(response)
+    if result is not None:
+        return result, None
+    if attempt + 1 >= LLM_PARSE_ATTEMPTS:
+        return None, None
+    logger.warning(f"Unparseable LLM response (attempt {attempt + 1}/{LLM_PARSE_ATTEMPTS}); retrying")
+    return None, prompt + LLM_JSON_RETRY_SUFFIX
+
+
+def _ask_for_json(ask, prompt: str):
+    """
+    Call `ask(prompt)`, re-asking once with a corrective suffix if the reply is not a JSON object.
+    Returns (raw_response, parsed_or_None); LLM error replies return immediately.
+    """
+    request = prompt
+    for attempt in range(LLM_PARSE_ATTEMPTS):
+        response = ask(request)
+        result, request = _json_attempt(prompt, response, attempt)
+        if request is None:
+            break
+    return response, result
+
+
+async def _ask_for_json_async(ask, prompt: str):
+    """Async twin of `_ask_for_json`; `ask` is a coroutine function."""
+    request = prompt
+    for attempt in range(LLM_PARSE_ATTEMPTS):
+        response = await ask(request)
+        result, request = _json_attempt(prompt, response, attempt)
+        if request is None:
+            break
+    return response, result
+
+
+# --- LLM Micro-Batching ---
+# Prompts submitted within a short window for the same model chain are folded
+# into one LLM request; the collector runs as a task on the server loop.
+LLM_MAX_BATCH = int(os.getenv("LLM_MAX_BATCH", "8"))
+LLM_BATCH_WINDOW = float(os.getenv("LLM_BATCH_WINDOW_MS", "50")) / 1000
+_llm_queue = None
+_llm_batcher = None
+# The loop only holds weak references to tasks, so in-flight batches are kept here.
+_llm_batch_tasks: set = set()
+
+
+def start_llm_batcher():
+    global _llm_queue, _llm_batcher
+    if _llm_batcher is None or _llm_batcher.done():
+        _llm_queue = asyncio.Queue()
+        _llm_batcher = asyncio.get_running_loop().create_task(_llm_batch_loop())
+    return _llm_batcher
+
+
+async def stop_llm_batcher():
+    global _llm_batcher
+    if _llm_batcher is not None:
+        _llm_batcher.cancel()
+        try:
+            await _llm_batcher
+        except asyncio.CancelledError:
+            pass
+        _llm_batcher = None
+    for task in list(_llm_batch_tasks):
+        task.cancel()
+    await asyncio.gather(*_llm_batch_tasks, return_exceptions=True)
+    # Prompts still queued will never be collected; release their callers.
+    while _llm_queue is not None and not _llm_queue.empty():
+        _, _, future = _llm_queue.get_nowait()
+        future.cancel()
+
+
+def _submit(prompt: str, model_chain: List[Tuple[str, str]], generation_config: Mapping[str, Any] = None) -> asyncio.Future:
+    if _llm_batcher is None or _llm_batcher.done() or not _llm_available(model_chain):
+        # No collector running (e.g. scripts outside the server) or nothing to batch: call directly.
+        return asyncio.ensure_future(_run_llm_async(prompt, model_chain, generation_config))
+    future = asyncio.get_running_loop().create_future()
+    # Only prompts with the same chain *and* generation config can share a request.
+    batch_key = (tuple(model_chain), tuple(sorted((generation_config or {}).items())))
+    _llm_queue.put_nowait((prompt, batch_key, future))
+    return future
+
+
+async def _llm_batch_loop():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _llm_queue.get()]
+        deadline = loop.time() + LLM_BATCH_WINDOW
+        try:
+            while len(batch) < LLM_MAX_BATCH:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(_llm_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+        groups: Dict[tuple, list] = {}
+        for prompt, batch_key, future in batch:
+            groups.setdefault(batch_key, []).append((prompt, future))
+        for (model_chain, config), items in groups.items():
+            task = loop.create_task(_run_llm_batch(list(model_chain), dict(config), items))
+            _llm_batch_tasks.add(task)
+            task.add_done_callback(_llm_batch_tasks.discard)
+
+
+async def _run_llm_batch(model_chain: List[Tuple[str, str]], generation_config: Dict[str, Any], items: list) -> None:
+    try:
+        if len(items) == 1:
+            answers = [await _run_llm_async(items[0][0], model_chain, generation_config)]
+        else:
+            batch_prompt = _batch_prompt([prompt for prompt, _ in items])
+            batch_config = dict(generation_config)
+            if "max_output_tokens" in batch_config:
+                # The reply carries one answer per item, so the output cap scales with the batch.
+                batch_config["max_output_tokens"] *= len(items)
+            response = await _run_llm_async(batch_prompt, model_chain, batch_config)
+            if _is_llm_error(response):
+                answers = [response] * len(items)
+            else:
+                answers = _parse_batch_response(response, len(items))
+            if answers is None:
+                logger.warning(f"LLM batch of {len(items)} could not be parsed; falling back to individual calls")
+                answers = await asyncio.gather(
+                    *(_run_llm_async(prompt, model_chain, generation_config) for prompt, _ in items)
+                )
+        for (_, future), answer in zip(items, answers):
+            if not future.done():
+                future.set_result(answer)
+    except asyncio.CancelledError:
+        for _, future in items:
+            future.cancel()
+        raise
+    except Exception as e:
+        for _, future in items:
+            if not future.done():
+                future.set_exception(e)
+
+
+def _batch_prompt(prompts: List[str]) -> str:
+    return (
+        f"Process the following {len(prompts)} items and return a JSON array: "
+        f"one entry per item, in the same order. If an item asks for a JSON object, "
+        f"its entry is that object; otherwise its entry is a plain string.\n"
+        f"{orjson.dumps(prompts).decode()}"
+    )
+
+
+def _parse_batch_response(response: str, expected: int):
+    try:
+        entries = orjson.loads(_strip_code_fence(response))
+    except ValueError:
+        return None
+    if not isinstance(entries, list) or len(entries) != expected:
+        return None
+    return [entry if isinstance(entry, str) else orjson.dumps(entry).decode() for entry in entries]
+
+def _incident_dict(incident) -> Dict[str, Any]:
+    # Callers may pass an Incident or a read-only view (e.g. MappingProxyType); prompts and history want the plain dict.
+    if isinstance(incident, Incident):
+        return incident.to_dict()
+    return incident if isinstance(incident, dict) else dict(incident)
+
+
+# --- LLM Plan Cache ---
+# Successful LLM plans are reused for identical requests. Deterministic fallbacks
+# are never cached: they depend on live unit status. Agents that fall back set
+# context['fallback'] on the envelope so its consumers don't keep it either.
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "256"))
+_plan_cache: "OrderedDict[bytes, Any]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+_plan_inflight: Dict[bytes, "asyncio.Task"] = {}
+
+# RESQ_LLM_CACHE=1 also persists plans to SQLite so repeat runs skip the LLM entirely.
+PLAN_CACHE_PERSIST = os.environ.get("RESQ_LLM_CACHE", "0").strip().lower() not in _FALSEY
+PLAN_CACHE_PATH = os.environ.get("RESQ_LLM_CACHE_PATH", ".llm_cache.sqlite3")
+_plan_db = None
+_plan_db_lock = threading.Lock()
+
+
+def _plan_key(prompt: str, model_chain: List[Tuple[str, str]], generation_config: Mapping[str, Any]) -> bytes:
+    # Everything that shapes the reply is hashed, so a prompt, model or config change
+    # never serves a plan persisted under the old one.
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(orjson.dumps(model_chain) + b"\0")
+    digest.update(orjson.dumps(generation_config, option=orjson.OPT_SORT_KEYS) + b"\0")
+    digest.update(prompt.encode())
+    return digest.digest()
+
+
+def _plan_store() -> sqlite3.Connection:
+    # Called with _plan_db_lock held, which serializes access to the connection.
+    global _plan_db
+    if _plan_db is None:
+        _plan_db = sqlite3.connect(PLAN_CACHE_PATH, check_same_thread=False)
+        _plan_db.execute("CREATE TABLE IF NOT EXISTS plans (key BLOB PRIMARY KEY, plan BLOB NOT NULL)")
+    return _plan_db
+
+
+def _memory_plan(key: bytes):
+    with _plan_cache_lock:
+        plan = _plan_cache.get(key)
+        if plan is not None:
+            _plan_cache.move_to_end(key)
+        return plan
+
+
+def _remember_plan(key: bytes, plan) -> None:
+    with _plan_cache_lock:
+        _plan_cache[key] = plan
+        _plan_cache.move_to_end(key)
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+
+
+def _stored_plan(key: bytes):
+    # Blocking SQLite read; a hit is promoted into the in-memory LRU.
+    with _plan_db_lock:
+        row = _plan_store().execute("SELECT plan FROM plans WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    plan = orjson.loads(row[0])
+    _remember_plan(key, plan)
+    return plan
+
+
+def _store_plan(key: bytes, plan) -> None:
+    # Blocking SQLite write.
+    with _plan_db_lock:
+        db = _plan_store()
+        db.execute(
+            "INSERT OR REPLACE INTO plans (key, plan) VALUES (?, ?)",
+            (key, orjson.dumps(plan, default=_json_default)),
+        )
+        db.commit()
+
+
+def _cached_plan(key: bytes, compute):
+    # compute() returns (plan, cacheable); so does this, and every cached plan is cacheable.
+    plan = _memory_plan(key)
+    if plan is None and PLAN_CACHE_PERSIST:
+        plan = _stored_plan(key)
+    if plan is not None:
+        return plan, True
+    plan, cacheable = compute()
+    if cacheable:
+        _remember_plan(key, plan)
+        if PLAN_CACHE_PERSIST:
+            _store_plan(key, plan)
+    return plan, cacheable
+
+
+async def _cached_plan_async(key: bytes, compute):
+    # Concurrent callers for the same key share one in-flight lookup and LLM call.
+    plan = _memory_plan(key)
+    if plan is not None:
+        return plan, True
+    task = _plan_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_load_or_compute_plan(key, compute))
+        _plan_inflight[key] = task
+        task.add_done_callback(lambda _: _plan_inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _load_or_compute_plan(key: bytes, compute):
+    # SQLite reads and commits block, so they run off the event loop.
+    if PLAN_CACHE_PERSIST:
+        plan = await asyncio.to_thread(_stored_plan, key)
+        if plan is not None:
+            return plan, True
+    plan, cacheable = await compute()
+    if cacheable:
+        _remember_plan(key, plan)
+        if PLAN_CACHE_PERSIST:
+            await asyncio.to_thread(_store_plan, key, plan)
+    return plan, cacheable
 
 # --- A2A Message Envelope ---
+def _json_default(obj):
+    # orjson fallback for values agents put in traces/content (sets, deques, mappings).
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (set, frozenset, tuple, deque)):
+        return list(obj)
+    return str(obj)
+
+
 class MessageEnvelope:
+    __slots__ = ("content", "sender", "receiver", "context", "_trace_raw", "_trace")
+
     def __init__(self, content=None, sender=None, receiver=None, trace=None, context=None):
         self.content = content or {}
         self.sender = sender
         self.receiver = receiver
-        self.trace = trace or []  # List of (agent, message) tuples
         self.context = context or {}
+        # Trace entries ({agent, message}) are stored pre-serialized, each followed by
+        # a comma, and only parsed back into a list when `trace` is actually read.
+        self._trace_raw = bytearray()
+        self._trace = None
+        for entry in trace or []:
+            self._trace_raw += orjson.dumps(entry, default=_json_default) + b","
+
+    @property
+    def trace(self):
+        if self._trace is None:
+            self._trace = orjson.loads(self.trace_json)
+        return self._trace
+
+    @property
+    def trace_json(self) -> bytes:
+        return b"[" + bytes(self._trace_raw[:-1]) + b"]"
 
     def add_trace(self, agent, message):
-        self.trace.append({"agent": agent, "message": message})
+        self._trace_raw += orjson.dumps({"agent": agent, "message": message}, default=_json_default) + b","
+        self._trace = None
+
+    def fork(self):
+        # Branch copy for agents running side by side; trace starts empty so merge() can append it.
+        return MessageEnvelope(content=dict(self.content), sender=self.sender, receiver=self.receiver, context=self.context)
+
+    def merge(self, branches):
+        for branch in branches:
+            self.content.update(branch.content)
+            self.context.update(branch.context)
+            self._trace_raw += branch._trace_raw
+        self._trace = None
+        return self
 
     def to_dict(self):
         return {
@@ -161,18 +760,35 @@ class MessageEnvelope:
             "context": self.context
         }
 
+    def to_json(self) -> bytes:
+        # Same shape as to_dict(), but the pre-serialized trace is spliced in as-is.
+        head = orjson.dumps(
+            {"content": self.content, "sender": self.sender, "receiver": self.receiver},
+            default=_json_default,
+        )
+        return (
+            head[:-1]
+            + b',"trace":' + self.trace_json
+            + b',"context":' + orjson.dumps(self.context, default=_json_default)
+            + b"}"
+        )
+
 # --- Session and Memory Management ---
+SESSION_HISTORY_LIMIT = 50
+MEMORY_FACT_LIMIT = 200
+
+
 class Session:
     def __init__(self, session_id=None):
         self.session_id = session_id or str(uuid.uuid4())
-        self.history = []  # List of (user, agent) tuples
+        self.history = deque(maxlen=SESSION_HISTORY_LIMIT)  # Last (user, agent) tuples
 
     def add_turn(self, user_msg, agent_msg):
         self.history.append((user_msg, agent_msg))
 
 class Memory:
     def __init__(self):
-        self.knowledge = []  # List of facts, summaries, etc.
+        self.knowledge = deque(maxlen=MEMORY_FACT_LIMIT)  # Most recent facts, summaries, etc.
 
     def add_fact(self, fact):
         self.knowledge.append(fact)
@@ -191,18 +807,36 @@ class SummaryAgent:
     def handle_envelope(self, envelope, session: Session = None):
         # Accepts MessageEnvelope, adds display_summary
         content = envelope.content
-        summary = content.get('summary', '')
-        recommendation = content.get('recommendation', '')
-        urgency = content.get('urgency', 'CRITICAL')
-        incident = content.get('incident', {})
-        display_summary = self.summarize_for_display(summary, recommendation, urgency, incident)
-        content['display_summary'] = display_summary
+        display_summary = self.summarize_for_display(*self._display_inputs(content))
+        return self._apply_summary(envelope, display_summary)
+
+    async def handle_envelope_async(self, envelope, session: Session = None):
+        display_summary = await self.summarize_for_display_async(*self._display_inputs(envelope.content))
+        return self._apply_summary(envelope, display_summary)
+
+    def _display_inputs(self, content):
+        return (
+            content.get('summary', ''),
+            content.get('recommendation', ''),
+            content.get('urgency', 'CRITICAL'),
+            content.get('incident', {}),
+        )
+
+    def _apply_summary(self, envelope, display_summary):
+        envelope.content['display_summary'] = display_summary
         envelope.add_trace(self.name, {'display_summary': display_summary})
-        envelope.content = content
         return envelope
 
     def summarize_for_display(self, summary, recommendation, urgency, incident):
-        prompt = (
+        response_text = _run_llm(self._summary_prompt(summary, recommendation, urgency), SUMMARY_MODEL_CHAIN)
+        return self._parse_summary(response_text, summary, recommendation, urgency, incident)
+
+    async def summarize_for_display_async(self, summary, recommendation, urgency, incident):
+        response_text = await _submit(self._summary_prompt(summary, recommendation, urgency), SUMMARY_MODEL_CHAIN)
+        return self._parse_summary(response_text, summary, recommendation, urgency, incident)
+
+    def _summary_prompt(self, summary, recommendation, urgency):
+        return (
             f"You are a UI assistant for a tiny dispatch terminal. "
             f"Given this summary: {summary}\n"
             f"and this recommendation: {recommendation}\n"
@@ -210,8 +844,9 @@ class SummaryAgent:
             f"Generate a concise, plain-language alert (max 60 chars) for a small screen. "
             f"Do not include JSON, just the message."
         )
-        response_text = _run_gemini(prompt, SUMMARY_MODEL_CHAIN)
-        if response_text.startswith("[Gemini"):
+
+    def _parse_summary(self, response_text, summary, recommendation, urgency, incident):
+        if _is_llm_error(response_text):
             return format_display_alert(summary, recommendation, incident, urgency)
         return response_text.strip()
 
@@ -221,6 +856,9 @@ def get_summary_agent():
 # --- Agent Definitions ---
 
 class DispatchAgent:
+    # Only reads the incident, so the orchestrator may run it alongside other independent agents.
+    independent = True
+
     def __init__(self, name, tools, memory=None):
         self.name = name
         self.tools = tools
@@ -229,12 +867,23 @@ class DispatchAgent:
     def handle_envelope(self, envelope, session: Session = None):
         # Accepts MessageEnvelope, adds summary and recommendation
         incident = envelope.content.get('incident', envelope.content)
-        plan = self._plan_dispatch(incident)
+        plan, from_llm = self._plan_dispatch(incident)
+        return self._apply_plan(envelope, incident, plan, from_llm, session)
+
+    async def handle_envelope_async(self, envelope, session: Session = None):
+        incident = envelope.content.get('incident', envelope.content)
+        plan, from_llm = await self._plan_dispatch_async(incident)
+        return self._apply_plan(envelope, incident, plan, from_llm, session)
+
+    def _apply_plan(self, envelope, incident, plan, from_llm, session):
+        if not from_llm:
+            envelope.context['fallback'] = True
         log_event("handle_incident", {"incident": incident, "summary": plan['summary'], "recommendation": plan['recommendation']})
         self.memory.add_fact({"incident": incident, "summary": plan['summary']})
         if session:
-            session.add_turn(str(incident), plan['recommendation'])
-        envelope.content['incident'] = incident
+            session.add_turn(str(_incident_dict(incident)), plan['recommendation'])
+        if incident is not envelope.content:
+            envelope.content['incident'] = incident
         envelope.content['summary'] = plan['summary']
         envelope.content['recommendation'] = plan['recommendation']
         envelope.add_trace(self.name, {'summary': plan['summary'], 'recommendation': plan['recommendation']})
@@ -245,35 +894,64 @@ class DispatchAgent:
         envelope = self.handle_envelope(envelope, session=session)
         return envelope.content
 
+    async def handle_incident_async(self, incident: Dict[str, Any], session: Session = None) -> Dict[str, Any]:
+        envelope = MessageEnvelope(content={"incident": incident}, sender=self.name, receiver=None)
+        envelope = await self.handle_envelope_async(envelope, session=session)
+        return envelope.content
+
     def _plan_dispatch(self, incident: Dict[str, Any]) -> Dict[str, Any]:
-        prompt = (
-            f"You are a dispatch agent. Given this incident: {incident}, "
+        prompt = self._dispatch_prompt(incident)
+
+        def compute():
+            llm_response, result = _ask_for_json(self.ask_gemini, prompt)
+            return self._parse_dispatch(incident, llm_response, result), self._cacheable(result)
+        return _cached_plan(_plan_key(prompt, DISPATCH_MODEL_CHAIN, DISPATCH_GENERATION_CONFIG), compute)
+
+    async def _plan_dispatch_async(self, incident: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = self._dispatch_prompt(incident)
+
+        async def compute():
+            llm_response, result = await _ask_for_json_async(self.ask_gemini_async, prompt)
+            return self._parse_dispatch(incident, llm_response, result), self._cacheable(result)
+        return await _cached_plan_async(_plan_key(prompt, DISPATCH_MODEL_CHAIN, DISPATCH_GENERATION_CONFIG), compute)
+
+    @staticmethod
+    def _cacheable(result) -> bool:
+        return result is not None and bool(result.get('summary'))
+
+    def _dispatch_prompt(self, incident: Dict[str, Any]) -> str:
+        return (
+            f"You are a dispatch agent. Given this incident: {_incident_dict(incident)}, "
             f"summarize the situation and recommend the best unit to deploy. "
             f"Respond with a JSON object with 'summary' and 'recommendation'."
         )
-        llm_response = self.ask_gemini(prompt)
-        import json
+
+    def _parse_dispatch(self, incident: Dict[str, Any], llm_response: str, result=None) -> Dict[str, Any]:
         plan = {"summary": "", "recommendation": ""}
-        try:
-            result = json.loads(llm_response)
+        if result is not None:
             plan["summary"] = result.get('summary', '')
             plan["recommendation"] = result.get('recommendation', '')
-        except Exception:
+        else:
             plan["summary"] = llm_response
             plan["recommendation"] = llm_response
 
-        if not plan["summary"] or plan["summary"].startswith("[Gemini"):
+        if not plan["summary"] or _is_llm_error(plan["summary"]):
             fallback = plan_relief_response(incident)
             plan["summary"] = fallback["summary"]
             plan["recommendation"] = fallback["recommendation"]
         return plan
 
     def ask_gemini(self, prompt: str) -> str:
-        return _run_gemini(prompt, DISPATCH_MODEL_CHAIN)
+        return _run_llm(prompt, DISPATCH_MODEL_CHAIN, DISPATCH_GENERATION_CONFIG)
+
+    async def ask_gemini_async(self, prompt: str) -> str:
+        return await _submit(prompt, DISPATCH_MODEL_CHAIN, DISPATCH_GENERATION_CONFIG)
 
 # --- Specialized Agent: ResourceAgent ---
 
 class ResourceAgent:
+    independent = True
+
     def __init__(self, name="Resource-Agent", memory=None):
         self.name = name
         self.memory = memory or Memory()
@@ -281,30 +959,64 @@ class ResourceAgent:
     def handle_envelope(self, envelope, session: Session = None):
         # Accepts MessageEnvelope, adds resources and resource_summary
         incident = envelope.content.get('incident', envelope.content)
-        prompt = (
-            f"You are a resource allocation agent. Given this incident: {incident}, "
+        (resources, resource_summary), from_llm = self._plan_resources(incident)
+        return self._apply_resources(envelope, incident, resources, resource_summary, from_llm, session)
+
+    async def handle_envelope_async(self, envelope, session: Session = None):
+        incident = envelope.content.get('incident', envelope.content)
+        (resources, resource_summary), from_llm = await self._plan_resources_async(incident)
+        return self._apply_resources(envelope, incident, resources, resource_summary, from_llm, session)
+
+    def _plan_resources(self, incident: Dict[str, Any]):
+        prompt = self._resource_prompt(incident)
+
+        def compute():
+            llm_response, result = _ask_for_json(self.ask_gemini, prompt)
+            return self._parse_resources(incident, llm_response, result), self._cacheable(result)
+        return _cached_plan(_plan_key(prompt, RESOURCE_MODEL_CHAIN, RESOURCE_GENERATION_CONFIG), compute)
+
+    async def _plan_resources_async(self, incident: Dict[str, Any]):
+        prompt = self._resource_prompt(incident)
+
+        async def compute():
+            llm_response, result = await _ask_for_json_async(self.ask_gemini_async, prompt)
+            return self._parse_resources(incident, llm_response, result), self._cacheable(result)
+        return await _cached_plan_async(_plan_key(prompt, RESOURCE_MODEL_CHAIN, RESOURCE_GENERATION_CONFIG), compute)
+
+    @staticmethod
+    def _cacheable(result) -> bool:
+        return result is not None and bool(result.get('resources'))
+
+    def _resource_prompt(self, incident: Dict[str, Any]) -> str:
+        return (
+            f"You are a resource allocation agent. Given this incident: {_incident_dict(incident)}, "
             f"list the best resources or units to send. "
             f"Respond with a JSON object with a 'resources' list and a 'summary' string."
         )
-        llm_response = self.ask_gemini(prompt)
-        import json
-        try:
-            result = json.loads(llm_response)
+
+    def _parse_resources(self, incident: Dict[str, Any], llm_response: str, result=None):
+        if result is not None:
             resources = result.get('resources', [])
             resource_summary = result.get('summary', '')
-        except Exception:
+        else:
             resources = []
             resource_summary = llm_response
 
-        if not resources or (isinstance(resources, str) and resources.startswith("[Gemini")):
+        if not resources or (isinstance(resources, str) and _is_llm_error(resources)):
             fallback = plan_relief_response(incident)
             resources = fallback["resources"]
             resource_summary = fallback["resource_summary"]
+        return resources, resource_summary
 
+    def _apply_resources(self, envelope, incident, resources, resource_summary, from_llm, session):
+        if not from_llm:
+            envelope.context['fallback'] = True
         log_event("resource_allocation", {"incident": incident, "resources": resources})
         self.memory.add_fact({"incident": incident, "resources": resources})
         if session:
-            session.add_turn(str(incident), resource_summary)
+            session.add_turn(str(_incident_dict(incident)), resource_summary)
+        if isinstance(resources, list):
+            resources = list(resources)  # the cached plan's list must not leak into callers
         envelope.content['resources'] = resources
         envelope.content['resource_summary'] = resource_summary
         envelope.add_trace(self.name, {'resources': resources, 'resource_summary': resource_summary})
@@ -315,23 +1027,91 @@ class ResourceAgent:
         envelope = self.handle_envelope(envelope, session=session)
         return envelope.content
 
+    async def handle_incident_async(self, incident: Dict[str, Any], session: Session = None) -> Dict[str, Any]:
+        envelope = MessageEnvelope(content={"incident": incident}, sender=self.name, receiver=None)
+        envelope = await self.handle_envelope_async(envelope, session=session)
+        return envelope.content
+
     def ask_gemini(self, prompt: str) -> str:
-        return _run_gemini(prompt, RESOURCE_MODEL_CHAIN)
+        return _run_llm(prompt, RESOURCE_MODEL_CHAIN, RESOURCE_GENERATION_CONFIG)
+
+    async def ask_gemini_async(self, prompt: str) -> str:
+        return await _submit(prompt, RESOURCE_MODEL_CHAIN, RESOURCE_GENERATION_CONFIG)
 
 def get_resource_agent():
-    return ResourceAgent()
+    # Every pipeline shares one instance; its only state is the bounded Memory of recent facts
+    if not hasattr(get_resource_agent, "_agent"):
+        get_resource_agent._agent = ResourceAgent()
+    return get_resource_agent._agent
 
 def get_dispatch_agent():
-    return DispatchAgent(
-        name="ResQ-Agent",
-        tools=[get_available_units, notify_dispatch]
-    )
+    if not hasattr(get_dispatch_agent, "_agent"):
+        get_dispatch_agent._agent = DispatchAgent(
+            name="ResQ-Agent",
+            tools=[get_available_units, notify_dispatch]
+        )
+    return get_dispatch_agent._agent
 
 def get_multiagent_system():
     agent1 = get_dispatch_agent()
     resource_agent = get_resource_agent()
     return MultiAgentSystem([agent1, resource_agent])
 
+# --- Single-Request Incident Probe ---
+PROBE_GENERATION_CONFIG = {
+    "temperature": 0,
+    "max_output_tokens": DISPATCH_GENERATION_CONFIG["max_output_tokens"] + RESOURCE_GENERATION_CONFIG["max_output_tokens"],
+    "response_mime_type": "application/json",
+}
+
+
+def _probe_prompt(incident: Dict[str, Any]) -> str:
+    return (
+        f"You are a dispatch planning system. Given this incident: "
+        f"{orjson.dumps(incident, default=_json_default).decode()}, respond with a JSON object with "
+        f"'dispatch_plan' (an object with 'summary' and 'recommendation' for the best unit to deploy) and "
+        f"'resource_plan' (an object with a 'resources' list of units to send and a 'summary' string)."
+    )
+
+
+def batched_incident_probe(incident: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the dispatch and resource plans for `incident` from a single LLM request.
+
+    Cheaper than running the agents when only their answers are needed; parts the
+    model leaves out fall back to the deterministic planner, exactly as in the agents.
+    `combined_plan` has the shape MultiAgentSystem.orchestrate returns.
+    """
+    prompt = _probe_prompt(incident)
+
+    def compute():
+        llm_response, result = _ask_for_json(
+            lambda text: _run_llm(text, DISPATCH_MODEL_CHAIN, PROBE_GENERATION_CONFIG), prompt
+        )
+        # With a parsed reply, a missing section must fall back rather than echo the whole reply.
+        text = llm_response if result is None else ""
+        sections = result or {}
+        dispatch_part = sections.get("dispatch_plan")
+        resource_part = sections.get("resource_plan")
+        if not isinstance(dispatch_part, dict):
+            dispatch_part = None
+        if not isinstance(resource_part, dict):
+            resource_part = None
+        dispatch_plan = get_dispatch_agent()._parse_dispatch(incident, text, dispatch_part)
+        resources, resource_summary = get_resource_agent()._parse_resources(incident, text, resource_part)
+        plans = {
+            "dispatch_plan": dispatch_plan,
+            "resource_plan": {"resources": resources, "resource_summary": resource_summary},
+        }
+        # A section that fell back depends on live unit status, so only full LLM answers are kept.
+        cacheable = DispatchAgent._cacheable(dispatch_part) and ResourceAgent._cacheable(resource_part)
+        return plans, cacheable
+
+    plans, _ = _cached_plan(_plan_key(prompt, DISPATCH_MODEL_CHAIN, PROBE_GENERATION_CONFIG), compute)
+    return {
+        **plans,
+        "combined_plan": {"incident": incident, **plans["dispatch_plan"], **plans["resource_plan"]},
+    }
+
 class MultiAgentSystem:
     def __init__(self, agents: List[Any]):
         self.agents = agents
@@ -342,6 +1122,15 @@ class MultiAgentSystem:
             envelope = agent.handle_envelope(envelope, session=session)
         return envelope.content
 
+    async def orchestrate_async(self, incident: Dict[str, Any], session: Session = None):
+        envelope = MessageEnvelope(content={"incident": incident}, sender="user", receiver=None)
+        for agent in self.agents:
+            if hasattr(agent, "handle_envelope_async"):
+                envelope = await agent.handle_envelope_async(envelope, session=session)
+            else:
+                envelope = agent.handle_envelope(envelope, session=session)
+        return envelope.content
+
 # --- Advanced A2A Orchestrator ---
 class A2AOrchestrator:
     def __init__(self, agents: List[Any]):
@@ -355,6 +1144,35 @@ class A2AOrchestrator:
             envelope = agent.handle_envelope(envelope, session=session)
         return envelope
 
+    async def orchestrate_async(self, envelope: MessageEnvelope, session: Session = None):
+        # Leading agents flagged `independent` only read the incident: fan them out
+        # on forked envelopes, merge their results, then run the rest in order.
+        parallel = []
+        for agent in self.agents:
+            if not getattr(agent, "independent", False):
+                break
+            parallel.append(agent)
+        if parallel:
+            branches = []
+            for agent in parallel:
+                branch = envelope.fork()
+                branch.sender = envelope.receiver
+                branch.receiver = agent.name
+                branches.append(branch)
+            results = await asyncio.gather(
+                *(agent.handle_envelope_async(branch, session=session) for agent, branch in zip(parallel, branches))
+            )
+            envelope.merge(results)
+            envelope.receiver = parallel[-1].name
+        for agent in self.agents[len(parallel):]:
+            envelope.sender = envelope.receiver
+            envelope.receiver = agent.name
+            if hasattr(agent, "handle_envelope_async"):
+                envelope = await agent.handle_envelope_async(envelope, session=session)
+            else:
+                envelope = agent.handle_envelope(envelope, session=session)
+        return envelope
+
 def get_a2a_orchestrator():
     agent1 = get_dispatch_agent()
     resource_agent = get_resource_agent()
@@ -6,10 +6,42 @@ running even when LLM access is unavailable.
 
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
+import heapq
+import itertools
 import random
+import time
+
+
+# --- Incident payload ---------------------------------------------------------
+
+@dataclass(frozen=True)
+class Incident:
+    """
+    Immutable, validated incident. Hashable, and read through the same
+    `.get()` calls the helpers below use on plain incident dicts.
+    """
+
+    type: str
+    location: str
+    urgency: str = "CRITICAL"
+
+    def __post_init__(self) -> None:
+        for field in fields(self):
+            if not isinstance(getattr(self, field.name), str):
+                raise TypeError(f"Incident.{field.name} must be a string")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _INCIDENT_FIELDS else default
+
+    def to_dict(self) -> Dict[str, str]:
+        return asdict(self)
+
+
+_INCIDENT_FIELDS = frozenset(field.name for field in fields(Incident))
 
 
 # --- Mocked resource inventory ------------------------------------------------
@@ -45,8 +77,9 @@ _UNIT_REGISTRY: List[Dict[str, str]] = [
     },
 ]
 
-_UNIT_STATUS: Dict[str, Dict[str, Optional[str]]] = {
-    unit["id"]: {"status": "available", "incident_id": None, "last_updated": datetime.utcnow()}
+# last_updated is a time.time() float; format it with _fmt_ts only when it is reported.
+_UNIT_STATUS: Dict[str, Dict[str, Any]] = {
+    unit["id"]: {"status": "available", "incident_id": None, "last_updated": time.time()}
     for unit in _UNIT_REGISTRY
 }
 
@@ -61,6 +94,17 @@ _SECTOR_MODIFIERS: Dict[str, int] = {
     "sector 8": 5,
 }
 
+_URGENT_LEVELS = frozenset({"critical", "high"})
+
+# Lower-cased unit fields keyed by unit id, computed once at import so scoring
+# and filtering don't re-normalize every unit on every call.
+_UNIT_TYPE_LC: Dict[str, str] = {unit["id"]: unit["type"].lower() for unit in _UNIT_REGISTRY}
+_UNIT_CAPS_LC: Dict[str, frozenset] = {
+    unit["id"]: frozenset(cap.lower() for cap in unit["capabilities"]) for unit in _UNIT_REGISTRY
+}
+
+_DEFAULT_SECTOR_MODIFIER = 6
+
 
 # --- Utility helpers ----------------------------------------------------------
 
@@ -68,63 +112,93 @@ def _normalize(value: Optional[str]) -> str:
     return (value or "unknown").strip().lower()
 
 
-def _estimate_arrival_minutes(unit: Dict[str, str], location: Optional[str]) -> int:
-    sector = _normalize(location)
-    modifier = _SECTOR_MODIFIERS.get(sector, 6)
-    eta = unit.get("base_eta", 6)
-    jitter = random.randint(-1, 1)
-    return max(3, eta + modifier // 2 + jitter)
+def _fmt_ts(ts: float) -> str:
+    # Naive UTC ISO string, same format as datetime.utcnow().isoformat().
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
 
 
-def _score_unit(unit: Dict[str, str], incident: Dict[str, str]) -> float:
-    incident_type = _normalize(incident.get("type"))
-    urgency = _normalize(incident.get("urgency"))
+def _base_eta(unit: Dict[str, str], sector: str) -> int:
+    return unit.get("base_eta", 6) + _SECTOR_MODIFIERS.get(sector, _DEFAULT_SECTOR_MODIFIER) // 2
+
+
+# Pre-drawn ETA jitter in [-1, 1], read round-robin instead of calling the PRNG per unit.
+# next() on itertools.count is atomic under the GIL, so concurrent workers can share it.
+_JITTER_SIZE = 1024  # power of two, so the index wraps with a mask
+_JITTER: List[int] = [random.randint(-1, 1) for _ in range(_JITTER_SIZE)]
+_JITTER_COUNTER = itertools.count()
+
+
+def _apply_jitter(eta: int) -> int:
+    return max(3, eta + _JITTER[next(_JITTER_COUNTER) & (_JITTER_SIZE - 1)])
+
+
+# Pre-jitter ETA from each unit's home location, used by every availability query.
+_HOME_ETA: Dict[str, int] = {unit["id"]: _base_eta(unit, _normalize(unit.get("location"))) for unit in _UNIT_REGISTRY}
+
+
+def _score_unit(unit: Dict[str, str], incident_type: str, urgency: str) -> float:
+    unit_id = unit["id"]
     score = 0.0
 
-    if incident_type and incident_type in unit["capabilities"]:
+    if incident_type and incident_type in _UNIT_CAPS_LC[unit_id]:
         score += 4
-    if incident_type in unit["type"]:
+    if incident_type in _UNIT_TYPE_LC[unit_id]:
         score += 3
-    if urgency in {"critical", "high"}:
+    if urgency in _URGENT_LEVELS:
         score += 2
     return score
 
 
+def _available_with_eta(wanted_type: Optional[str] = None) -> List[Tuple[int, Dict[str, str]]]:
+    # (eta_minutes, registry unit) pairs, nearest first; registry dicts are not copied.
+    candidates = []
+    for unit in _UNIT_REGISTRY:
+        unit_id = unit["id"]
+        if _UNIT_STATUS[unit_id]["status"] != "available":
+            continue
+        if wanted_type and wanted_type not in _UNIT_TYPE_LC[unit_id]:
+            continue
+        candidates.append((_apply_jitter(_HOME_ETA[unit_id]), unit))
+    candidates.sort(key=lambda item: item[0])
+    return candidates
+
+
+def _with_eta(unit: Dict[str, str], eta_minutes: int) -> Dict[str, str]:
+    enriched = dict(unit)
+    enriched["eta_minutes"] = eta_minutes
+    return enriched
+
+
 # --- Public helpers -----------------------------------------------------------
 
 def get_available_units(unit_type: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, str]]:
     """
     Return currently available units, optionally filtered by type and limit.
     """
-    candidates = []
-    for unit in _UNIT_REGISTRY:
-        status = _UNIT_STATUS[unit["id"]]["status"]
-        if status != "available":
-            continue
-        if unit_type and _normalize(unit_type) not in unit["type"]:
-            continue
-        enriched = dict(unit)
-        enriched["eta_minutes"] = _estimate_arrival_minutes(unit, unit.get("location"))
-        candidates.append(enriched)
-
-    candidates.sort(key=lambda u: u["eta_minutes"])
+    candidates = _available_with_eta(_normalize(unit_type) if unit_type else None)
     if limit:
         candidates = candidates[:limit]
-    return candidates
+    return [_with_eta(unit, eta) for eta, unit in candidates]
 
 
 def recommend_units_for_incident(incident: Dict[str, str], limit: int = 2) -> List[Dict[str, str]]:
     """
     Rank units for an incident and return the top matches.
     """
-    ranked: List[Tuple[float, Dict[str, str]]] = []
-    for unit in get_available_units(limit=None):
-        score = _score_unit(unit, incident)
-        if score <= 0:
-            continue
-        ranked.append((score, unit))
-    ranked.sort(key=lambda item: item[0], reverse=True)
-    return [unit for _, unit in ranked[:limit]]
+    incident_type = _normalize(incident.get("type"))
+    urgency = _normalize(incident.get("urgency"))
+    # nlargest is stable on ties, so equal scores keep the ETA order from _available_with_eta.
+    # Only the selected units are copied into enriched dicts.
+    top: List[Tuple[float, int, Dict[str, str]]] = heapq.nlargest(
+        limit,
+        (
+            (score, eta, unit)
+            for eta, unit in _available_with_eta()
+            if (score := _score_unit(unit, incident_type, urgency)) > 0
+        ),
+        key=lambda item: item[0],
+    )
+    return [_with_eta(unit, eta) for _, eta, unit in top]
 
 
 def generate_incident_brief(incident: Dict[str, str]) -> str:
@@ -184,17 +258,18 @@ def notify_dispatch(unit_id: str, incident: Dict[str, str]) -> Dict[str, str]:
     Simulate notifying downstream systems about a dispatch event.
     Updates the in-memory registry and returns a record for logging.
     """
+    now = time.time()
     record = {
         "unit_id": unit_id,
         "incident_id": incident.get("id"),
         "location": incident.get("location"),
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": _fmt_ts(now),
         "status": "queued",
     }
     if unit_id in _UNIT_STATUS:
         _UNIT_STATUS[unit_id]["status"] = "assigned"
         _UNIT_STATUS[unit_id]["incident_id"] = incident.get("id")
-        _UNIT_STATUS[unit_id]["last_updated"] = datetime.utcnow()
+        _UNIT_STATUS[unit_id]["last_updated"] = now
     print(f"[ReliefTools] Dispatching {unit_id} to {record['location']} (incident {record['incident_id']})")
     return record
 
@@ -203,4 +278,4 @@ def release_unit(unit_id: str) -> None:
     if unit_id in _UNIT_STATUS:
         _UNIT_STATUS[unit_id]["status"] = "available"
         _UNIT_STATUS[unit_id]["incident_id"] = None
-        _UNIT_STATUS[unit_id]["last_updated"] = datetime.utcnow()
+        _UNIT_STATUS[unit_id]["last_updated"] = time.time()
@@ -4,33 +4,50 @@ Handles session, memory, and incident tracking.
 """
 
 import uuid
+from collections import OrderedDict
+from collections.abc import Hashable
 from datetime import datetime
 
 # Agentic state: session, memory, incident tracking, metrics
 from app.agents import Session, Memory
 
+MAX_SESSIONS = 1024
+
 
 class SystemState:
     def __init__(self):
-        self.active_incidents = []
+        self.active_incidents = OrderedDict()  # incident_id -> incident, oldest first
         self.memory = Memory()
-        self.sessions = {}  # session_id -> Session
+        self.sessions = OrderedDict()  # session_id -> Session, least recently used first
         self.metrics = {"incidents": 0, "decisions": 0}
 
     def add_incident(self, incident):
         record = dict(incident)
         record.setdefault("id", str(uuid.uuid4()))
+        if not isinstance(record["id"], Hashable):
+            # Incidents are indexed by id; a JSON list/object id is kept in string form.
+            record["id"] = str(record["id"])
         record.setdefault("timestamp", datetime.utcnow().isoformat())
-        self.active_incidents.append(record)
+        self.active_incidents[record["id"]] = record
+        # A re-posted id becomes the latest incident again.
+        self.active_incidents.move_to_end(record["id"])
         self.metrics["incidents"] += 1
         return record
 
     def resolve_incident(self, incident_id):
-        self.active_incidents = [i for i in self.active_incidents if i.get('id') != incident_id]
+        self.active_incidents.pop(incident_id, None)
+
+    def get_latest_incident(self):
+        if not self.active_incidents:
+            return None
+        return next(reversed(self.active_incidents.values()))
 
     def get_or_create_session(self, session_id=None):
         if session_id and session_id in self.sessions:
+            self.sessions.move_to_end(session_id)
             return self.sessions[session_id]
         session = Session(session_id)
         self.sessions[session.session_id] = session
+        if len(self.sessions) > MAX_SESSIONS:
+            self.sessions.popitem(last=False)
         return session
@@ -5,12 +5,15 @@ Handles REST API and WebSocket connections to hardware client.
 """
 
 import os
+import time
+from collections import OrderedDict
+import orjson
 from fastapi import FastAPI, WebSocket, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.state import SystemState
-from app.agents import get_dispatch_agent, get_decision_agent, get_multiagent_system, log_event, get_summary_agent, get_a2a_orchestrator, MessageEnvelope
+from app.agents import get_dispatch_agent, get_decision_agent, get_multiagent_system, log_event, get_summary_agent, get_a2a_orchestrator, MessageEnvelope, start_llm_batcher, stop_llm_batcher
 from app.relief_tools import get_available_units, notify_dispatch
 
 # Load environment variables (API keys, etc.)
@@ -18,7 +21,14 @@ from dotenv import load_dotenv
 load_dotenv()
 #print("API_KEY from env:", os.getenv("API_KEY"))
 
-app = FastAPI()
+
+class ORJSONResponse(JSONResponse):
+    # Same as fastapi.responses.ORJSONResponse, which recent FastAPI releases deprecate.
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -35,32 +45,86 @@ summary_agent = get_summary_agent()
 a2a_orchestrator = get_a2a_orchestrator()
 decision_agent = get_decision_agent()
 
+# Orchestrated /incident/latest (payload, envelope, expires_at) entries keyed by incident id (LRU),
+# filled by POST /incident and the first poll, so repeated polls don't re-run the agent pipeline.
+# Deterministic fallback plans track live unit status and the LLM may come back, so those
+# entries expire after ORCHESTRATION_FALLBACK_TTL seconds; LLM plans are kept until evicted.
+ORCHESTRATION_CACHE_SIZE = 64
+ORCHESTRATION_FALLBACK_TTL = 30.0
+_orchestration_cache = OrderedDict()
+
+
+def _cached_orchestration(incident_id):
+    # The cached (payload, envelope) for incident_id, or None if missing or expired.
+    cached = _orchestration_cache.get(incident_id)
+    if cached is None:
+        return None
+    payload, envelope, expires_at = cached
+    if expires_at is not None and expires_at <= time.monotonic():
+        del _orchestration_cache[incident_id]
+        return None
+    _orchestration_cache.move_to_end(incident_id)
+    return payload, envelope
+
+
+def _cache_orchestration(incident, envelope):
+    # Cache the /incident/latest view of an orchestrated incident; returns (payload, envelope).
+    content = envelope.content
+    incident_id = incident.get('id', None)
+    payload = {
+        'summary': content.get('summary', ''),
+        'recommendation': content.get('recommendation', ''),
+        'urgency': content.get('urgency', 'CRITICAL'),
+        'id': incident_id,
+        'session_id': None,
+        'display_summary': content.get('display_summary', ''),
+        'resources': content.get('resources', []),
+        'resource_summary': content.get('resource_summary', ''),
+    }
+    if incident_id is not None:
+        expires_at = time.monotonic() + ORCHESTRATION_FALLBACK_TTL if envelope.context.get('fallback') else None
+        _orchestration_cache[incident_id] = (payload, envelope, expires_at)
+        _orchestration_cache.move_to_end(incident_id)
+        if len(_orchestration_cache) > ORCHESTRATION_CACHE_SIZE:
+            _orchestration_cache.popitem(last=False)
+    return payload, envelope
+
+
+# Coalesce concurrent agent prompts into batched LLM requests
+@app.on_event("startup")
+async def start_batcher():
+    start_llm_batcher()
+
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await stop_llm_batcher()
+
 # Endpoint for ESP32 to poll for latest incident (with session support, A2A)
 @app.get('/incident/latest')
-async def get_latest_incident(session_id: str = None):
-    if state.active_incidents:
-        incident = state.active_incidents[-1]
+async def get_latest_incident(session_id: str = None, verbose: bool = True):
+    # verbose=0 leaves out the agent trace, which the ESP32 display never reads
+    incident = state.get_latest_incident()
+    if incident is not None:
         session = state.get_or_create_session(session_id)
-        envelope = MessageEnvelope(content={"incident": incident, "urgency": incident.get("urgency", "CRITICAL")}, sender="user", receiver=None)
-        envelope = a2a_orchestrator.orchestrate(envelope, session=session)
-        content = envelope.content
-        log_event("incident_polled", {"incident": incident, "session_id": session.session_id, "trace": envelope.trace})
-        return JSONResponse({
-            'summary': content.get('summary', ''),
-            'recommendation': content.get('recommendation', ''),
-            'urgency': content.get('urgency', 'CRITICAL'),
-            'id': incident.get('id', None),
-            'session_id': session.session_id,
-            'display_summary': content.get('display_summary', ''),
-            'resources': content.get('resources', []),
-            'resource_summary': content.get('resource_summary', ''),
-            'trace': envelope.trace
-        })
-    return JSONResponse({'active': False})
+        incident_id = incident.get('id', None)
+        cached = _cached_orchestration(incident_id)
+        if cached is not None:
+            payload, envelope = cached
+        else:
+            envelope = MessageEnvelope(content={"incident": incident, "urgency": incident.get("urgency", "CRITICAL")}, sender="user", receiver=None)
+            envelope = await a2a_orchestrator.orchestrate_async(envelope, session=session)
+            log_event("incident_polled", {"incident": incident, "session_id": session.session_id, "trace": envelope.trace_json.decode()})
+            payload, envelope = _cache_orchestration(incident, envelope)
+        response = {**payload, 'session_id': session.session_id}
+        if verbose:
+            response['trace'] = envelope.trace
+        return ORJSONResponse(response)
+    return ORJSONResponse({'active': False})
 
 @app.get('/incidents')
 async def get_all_incidents():
-    return {"active_incidents": state.active_incidents}
+    return {"active_incidents": list(state.active_incidents.values())}
 
 
 # ESP32 sends decision (SEND/HOLD) -- now uses A2A orchestrator for full agentic trace
@@ -73,14 +137,12 @@ async def incident_decision(request: Request):
     state.metrics["decisions"] += 1
 
     incident_id = None
-    if state.active_incidents:
-        incident = state.active_incidents[-1]
+    incident = state.get_latest_incident()
+    if incident is not None:
         incident_id = incident.get('id', None)
         # Remove the latest incident after a decision
-        if 'id' in incident:
-            state.resolve_incident(incident['id'])
-        else:
-            state.active_incidents.pop()  # fallback if no id
+        state.resolve_incident(incident_id)
+        _orchestration_cache.pop(incident_id, None)
 
     # Use A2A orchestrator to process the decision as an agentic step
     session = state.get_or_create_session(session_id)
@@ -92,8 +154,8 @@ async def incident_decision(request: Request):
         sender="user",
         receiver=None
     )
-    envelope = a2a_orchestrator.orchestrate(envelope, session=session)
-    log_event("decision_processed", {"action": action, "incident_id": incident_id, "trace": envelope.trace})
+    envelope = await a2a_orchestrator.orchestrate_async(envelope, session=session)
+    log_event("decision_processed", {"action": action, "incident_id": incident_id, "trace": envelope.trace_json.decode()})
     # Return the final envelope content and trace
     return {
         "decision_status": envelope.content.get("decision_status", ""),
@@ -113,10 +175,12 @@ async def new_incident(incident: dict, session_id: str = None):
     session = state.get_or_create_session(session_id)
     # Use A2A orchestrator for advanced agentic pipeline
     envelope = MessageEnvelope(content={"incident": incident, "urgency": incident.get("urgency", "CRITICAL")}, sender="user", receiver=None)
-    envelope = a2a_orchestrator.orchestrate(envelope, session=session)
-    log_event("incident_added", {"incident": incident, "session_id": session.session_id, "trace": envelope.trace})
+    envelope = await a2a_orchestrator.orchestrate_async(envelope, session=session)
+    log_event("incident_added", {"incident": incident, "session_id": session.session_id, "trace": envelope.trace_json.decode()})
+    # Seed the poll cache so the usual follow-up GET /incident/latest doesn't re-run the agents
+    _cache_orchestration(incident, envelope)
     # Optionally notify hardware client (WebSocket, etc.)
-    return envelope.to_dict()
+    return Response(envelope.to_json(), media_type="application/json")
 
 
 # WebSocket for real-time communication (optional, for future use)
@@ -301,7 +301,8 @@ bool pollIncident() {
   if (WiFi.status() != WL_CONNECTED) return false;
 
   HTTPClient http;
-  String url = String(BACKEND_URL) + "/incident/latest";
+  // verbose=0: skip the agent trace so the reply fits the 512-byte JSON doc
+  String url = String(BACKEND_URL) + "/incident/latest?verbose=0";
 
   if (!http.begin(url.c_str())) return false;
 